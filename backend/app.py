@@ -1,10 +1,20 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, validator
-from typing import List, Dict, Optional
+from fastapi.responses import Response
+from pydantic import BaseModel, Field, StringConstraints, TypeAdapter, ValidationError, conlist
+from typing import Annotated, Deque, List, Dict, NamedTuple, Optional
 from datetime import datetime
+import asyncio
+import hashlib
 import json
+import logging
 import os
+import re
+import time
+import uuid
+from collections import OrderedDict, deque
+from itertools import islice
 from enum import Enum
 
 # Import the existing Reddit Mastermind logic
@@ -14,59 +24,50 @@ from reddit_mastermind import (
     RedditComment, 
     GeneratedContent,
     QualityScore,
-    generate_reddit_calendar
+    generate_reddit_calendar,
+    get_llm
 )
 
+logger = logging.getLogger(__name__)
+
+# uvicorn only configures its own loggers; without this the agent progress lines
+# (and this module's) fall through to the last-resort handler, which drops INFO.
+# Runs at import so it also applies under `uvicorn app:app` and reload workers.
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(message)s")
+
 # ==================== API MODELS ====================
 
+# Constrained field types: length and pattern checks run inside pydantic-core,
+# so no per-item Python validator is needed
+Username = Annotated[str, StringConstraints(min_length=3, max_length=50, pattern=r"^[A-Za-z0-9_-]+$")]
+Quirk = Annotated[str, StringConstraints(min_length=2, max_length=100)]
+Subreddit = Annotated[str, StringConstraints(pattern=r"^r/[A-Za-z0-9_]{2,28}$")]
+TargetQuery = Annotated[str, StringConstraints(min_length=2, max_length=100)]
+
 class PersonaCreate(BaseModel):
     """API model for creating personas"""
-    username: str = Field(..., min_length=3, max_length=50)
+    username: Username
     name: str = Field(..., min_length=2, max_length=100)
     background: str = Field(..., min_length=10, max_length=500)
     style: str = Field(..., min_length=10, max_length=300)
     expertise: str = Field(..., min_length=5, max_length=300)
-    quirks: List[str] = Field(default_factory=list, max_items=10)
+    quirks: conlist(Quirk, max_length=10) = Field(default_factory=list)
     posting_patterns: str = Field(default="", max_length=200)
-    
-    @validator('quirks')
-    def validate_quirks(cls, v):
-        if len(v) > 0:
-            for quirk in v:
-                if len(quirk) < 2 or len(quirk) > 100:
-                    raise ValueError('Each quirk must be 2-100 characters')
-        return v
 
 class CalendarRequest(BaseModel):
     """Request model for generating calendar"""
     company_info: str = Field(..., min_length=50, max_length=2000, 
                               description="Detailed company information")
-    personas: List[PersonaCreate] = Field(..., min_items=2, max_items=10,
+    personas: List[PersonaCreate] = Field(..., min_length=2, max_length=10,
                                           description="2-10 personas required")
-    subreddits: List[str] = Field(..., min_items=1, max_items=20,
-                                   description="Target subreddits (e.g., r/startups)")
-    target_queries: List[str] = Field(..., min_items=1, max_items=30,
-                                       description="Keywords/queries to target")
+    subreddits: conlist(Subreddit, min_length=1, max_length=20) = Field(
+        ..., description="Target subreddits (e.g., r/startups)")
+    target_queries: conlist(TargetQuery, min_length=1, max_length=30) = Field(
+        ..., description="Keywords/queries to target")
     posts_per_week: int = Field(..., ge=1, le=15,
                                  description="Number of posts per week (1-15)")
     week_number: int = Field(default=1, ge=1, le=52,
                              description="Week number (1-52)")
-    
-    @validator('subreddits')
-    def validate_subreddits(cls, v):
-        for sub in v:
-            if not sub.startswith('r/'):
-                raise ValueError(f'Subreddit must start with r/ - got: {sub}')
-            if len(sub) < 4 or len(sub) > 30:
-                raise ValueError(f'Subreddit name invalid length: {sub}')
-        return v
-    
-    @validator('target_queries')
-    def validate_queries(cls, v):
-        for query in v:
-            if len(query) < 2 or len(query) > 100:
-                raise ValueError(f'Query must be 2-100 characters: {query}')
-        return v
 
 class CalendarResponse(BaseModel):
     """Response model for generated calendar"""
@@ -94,11 +95,239 @@ class JobResponse(BaseModel):
     result: Optional[CalendarResponse] = None
     error: Optional[str] = None
 
-# ==================== IN-MEMORY STORAGE ====================
-# In production, use Redis/PostgreSQL
+# Validators compiled once at import time and reused by the endpoints that take a body
+_PERSONAS_ADAPTER = TypeAdapter(List[PersonaCreate])
+_REQUEST_ADAPTER = TypeAdapter(CalendarRequest)
+
+# Batch serializers for generated content (one pydantic-core call per list)
+_POSTS_DUMP = TypeAdapter(List[RedditPost])
+_COMMENTS_DUMP = TypeAdapter(List[RedditComment])
+_CALENDAR_DUMP = TypeAdapter(CalendarResponse)
+_JOB_DUMP = TypeAdapter(JobResponse)
+
+def json_response(content: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Wrap already-encoded JSON, bypassing FastAPI's re-encoding"""
+    return Response(content=content, media_type="application/json", headers=headers)
+
+def _validate_body(adapter: TypeAdapter, body: bytes):
+    """Parse and validate a raw JSON body in one pass, reporting failures as a normal 422"""
+    try:
+        return adapter.validate_json(body)
+    except ValidationError as e:
+        # json_invalid carries the raw body bytes as input; don't echo them back
+        # (FastAPI's own decode errors use input={} too)
+        raise RequestValidationError([
+            {**err, "loc": ("body", *err["loc"]), **({"input": {}} if err["type"] == "json_invalid" else {})}
+            for err in e.errors(include_url=False)
+        ])
+
+def _openapi_body(adapter: TypeAdapter) -> Dict:
+    """OpenAPI request body for endpoints that validate the raw body themselves"""
+    schema = adapter.json_schema()
+    defs = schema.pop("$defs", {})
+    
+    # Inline nested model refs, since these schemas are not registered as components
+    def inline(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(defs[node["$ref"].rsplit("/", 1)[-1]])
+            return {k: inline(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [inline(v) for v in node]
+        return node
+    
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": inline(schema)}}}}
+
+# ==================== STORAGE ====================
+# In-memory LRU by default; set REDIS_URL to share state across workers
+
+class LRU(OrderedDict):
+    """Bounded dict that evicts the least recently used entry on overflow"""
+
+    def __init__(self, cap: int):
+        super().__init__()
+        self.cap = cap
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.cap:
+            self.popitem(last=False)
+
+class StoredCalendar(NamedTuple):
+    """JSON encoding and ETag of a calendar, computed once when it is stored,
+    plus the original request so later weeks can be generated from it"""
+    body: bytes
+    etag: str
+    request: bytes
+
+    @classmethod
+    def encode(cls, calendar: CalendarResponse, request: CalendarRequest) -> "StoredCalendar":
+        body = _CALENDAR_DUMP.dump_json(calendar)
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        return cls(body, etag, _REQUEST_ADAPTER.dump_json(request))
+
+    @property
+    def calendar(self) -> CalendarResponse:
+        return CalendarResponse.model_validate_json(self.body)
+
+# Every store exposes the same async interface (fetch/save/remove, plus recent for
+# calendars) so the Redis-backed stores never block the event loop
+
+class MemoryJobStore(LRU):
+    """In-process job store"""
+
+    async def fetch(self, job_id: str) -> Optional[JobResponse]:
+        try:
+            return self[job_id]
+        except KeyError:
+            return None
+
+    async def save(self, job_id: str, job: JobResponse):
+        self[job_id] = job
+
+class MemoryCalendarStore(LRU):
+    """In-process calendar store with a newest-first id index and cached list pages"""
+
+    def __init__(self, cap: int):
+        super().__init__(cap)
+        self._order: Deque[str] = deque()
+        # Bounded: clients choose (offset, limit), so only recent pages are kept
+        self._pages: LRU = LRU(cap=32)
+
+    def __setitem__(self, calendar_id: str, stored: StoredCalendar):
+        super().__setitem__(calendar_id, stored)
+        self._order.appendleft(calendar_id)
+        self._pages.clear()
+        # Deleted/evicted ids are skipped lazily; compact once they dominate
+        if len(self._order) > 2 * len(self):
+            self._order = deque(i for i in self._order if i in self)
+
+    def __delitem__(self, calendar_id: str):
+        super().__delitem__(calendar_id)
+        self._pages.clear()
+
+    async def fetch(self, calendar_id: str) -> Optional[StoredCalendar]:
+        try:
+            return self[calendar_id]
+        except KeyError:
+            return None
+
+    async def save(self, calendar_id: str, stored: StoredCalendar):
+        self[calendar_id] = stored
+
+    async def remove(self, calendar_id: str) -> bool:
+        if calendar_id not in self:
+            return False
+        del self[calendar_id]
+        return True
+
+    async def recent(self, offset: int, limit: int) -> bytes:
+        try:
+            return self._pages[(offset, limit)]
+        except KeyError:
+            live = (i for i in self._order if i in self)
+            # Plain dict lookup so listing does not reorder the LRU
+            bodies = (dict.__getitem__(self, i).body for i in islice(live, offset, offset + limit))
+            page = b"[" + b",".join(bodies) + b"]"
+            self._pages[(offset, limit)] = page
+            return page
+
+class RedisCalendarStore:
+    """Calendars stored as Redis hashes (calendar:{id} -> StoredCalendar fields)
+    plus a newest-first id list"""
+
+    INDEX = "calendars:index"
+
+    def __init__(self, client):
+        self.r = client
+
+    async def fetch(self, calendar_id: str) -> Optional[StoredCalendar]:
+        body, etag, request = await self.r.hmget(f"calendar:{calendar_id}", *StoredCalendar._fields)
+        if body is None:
+            return None
+        return StoredCalendar(body.encode(), etag, request.encode())
+
+    async def save(self, calendar_id: str, stored: StoredCalendar):
+        pipe = self.r.pipeline()
+        pipe.hset(f"calendar:{calendar_id}", mapping=stored._asdict())
+        pipe.lpush(self.INDEX, calendar_id)
+        await pipe.execute()
+
+    async def remove(self, calendar_id: str) -> bool:
+        pipe = self.r.pipeline()
+        pipe.delete(f"calendar:{calendar_id}")
+        pipe.lrem(self.INDEX, 0, calendar_id)
+        deleted, _ = await pipe.execute()
+        return bool(deleted)
+
+    async def recent(self, offset: int, limit: int) -> bytes:
+        ids = await self.r.lrange(self.INDEX, offset, offset + limit - 1)
+        pipe = self.r.pipeline()
+        for calendar_id in ids:
+            pipe.hget(f"calendar:{calendar_id}", "body")
+        return ("[" + ",".join(data for data in await pipe.execute() if data) + "]").encode()
+
+class RedisJobStore:
+    """Jobs stored as Redis hashes (job:{id}); results are referenced by calendar_id"""
+
+    def __init__(self, client, calendars: RedisCalendarStore):
+        self.r = client
+        self.calendars = calendars
+
+    async def fetch(self, job_id: str) -> Optional[JobResponse]:
+        data = await self.r.hgetall(f"job:{job_id}")
+        if not data:
+            return None
+        calendar_id = data.pop("calendar_id", None)
+        stored = await self.calendars.fetch(calendar_id) if calendar_id else None
+        return JobResponse(**data, result=stored.calendar if stored else None)
+
+    async def save(self, job_id: str, job: JobResponse):
+        fields = job.model_dump(mode="json", exclude={"result"}, exclude_none=True)
+        if job.result is not None:
+            fields["calendar_id"] = job.result.calendar_id
+        await self.r.hset(f"job:{job_id}", mapping=fields)
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    from redis import asyncio as aioredis
+
+    _redis = aioredis.Redis.from_url(REDIS_URL, decode_responses=True)
+    calendars_db = RedisCalendarStore(_redis)
+    jobs_db = RedisJobStore(_redis, calendars_db)
+else:
+    jobs_db = MemoryJobStore(cap=int(os.getenv("JOBS_CAP", "1024")))
+    calendars_db = MemoryCalendarStore(cap=int(os.getenv("CALENDARS_CAP", "1024")))
 
-jobs_db: Dict[str, JobResponse] = {}
-calendars_db: Dict[str, CalendarResponse] = {}
+# Set CELERY_BROKER_URL to run generation in a separate worker pool
+# (celery -A app.celery_app worker) instead of the API process
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
+
+if CELERY_BROKER_URL and not REDIS_URL:
+    raise RuntimeError("CELERY_BROKER_URL requires REDIS_URL so workers share job storage")
+
+# Maximum number of calendar generations running at once in this process
+generation_slots = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENT_JOBS", "4")))
+
+# ==================== IDS ====================
+
+def _uuid7() -> uuid.UUID:
+    """RFC 9562 UUIDv7: 48-bit millisecond timestamp followed by random bits"""
+    ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    rand_a = rand >> 68                  # 12 bits
+    rand_b = rand & ((1 << 62) - 1)      # 62 bits
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (rand_a << 64) | (0b10 << 62) | rand_b)
+
+# Time-ordered ids sort by creation time (stdlib uuid7 is Python 3.14+)
+uuid7 = getattr(uuid, "uuid7", _uuid7)
 
 # ==================== FASTAPI APP ====================
 
@@ -110,10 +339,14 @@ app = FastAPI(
     redoc_url="/api/redoc"
 )
 
-# CORS configuration
+# CORS configuration (Starlette matches allow_origins literally, so the
+# Vercel preview wildcard has to be expressed as a regex)
+ALLOWED_ORIGIN_REGEX = r"^(http://localhost:3000|https://[A-Za-z0-9-]+\.vercel\.app)$"
+re.compile(ALLOWED_ORIGIN_REGEX)  # fail fast on a bad pattern
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000", "https://*.vercel.app"],
+    allow_origin_regex=ALLOWED_ORIGIN_REGEX,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -136,9 +369,23 @@ async def root():
         }
     }
 
-@app.post("/api/calendar/generate", response_model=JobResponse, status_code=202)
+@app.post(
+    "/api/calendar/generate",
+    response_model=JobResponse,
+    status_code=202,
+    openapi_extra={
+        **_openapi_body(_REQUEST_ADAPTER),
+        "parameters": [{
+            "name": "Idempotency-Key",
+            "in": "header",
+            "required": False,
+            "schema": {"type": "string"},
+            "description": "Retries with the same key and payload share one in-flight generation"
+        }]
+    }
+)
 async def generate_calendar(
-    request: CalendarRequest,
+    http_request: Request,
     background_tasks: BackgroundTasks
 ):
     """
@@ -146,6 +393,17 @@ async def generate_calendar(
     
     Returns a job_id immediately. Poll /api/calendar/status/{job_id} for results.
     """
+    request = _validate_body(_REQUEST_ADAPTER, await http_request.body())
+    return await start_generation_job(
+        request, background_tasks, idempotency_key=http_request.headers.get("idempotency-key")
+    )
+
+async def start_generation_job(
+    request: CalendarRequest,
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = None
+) -> JobResponse:
+    """Create a pending job and schedule its generation"""
     
     # Validate API key
     if not os.getenv("GROQ_API_KEY"):
@@ -155,7 +413,7 @@ async def generate_calendar(
         )
     
     # Create job ID
-    job_id = f"job_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.urandom(4).hex()}"
+    job_id = f"job_{uuid7()}"
     
     # Initialize job
     job = JobResponse(
@@ -163,23 +421,64 @@ async def generate_calendar(
         status=JobStatus.PENDING,
         created_at=datetime.now().isoformat()
     )
-    jobs_db[job_id] = job
+    await jobs_db.save(job_id, job)
     
-    # Add background task
-    background_tasks.add_task(
-        process_calendar_generation,
-        job_id=job_id,
-        request=request
-    )
+    # Hand off to the worker pool, or run in-process as a background task
+    if celery_app is not None:
+        generate_calendar_task.apply_async(args=[job_id, request.model_dump()], task_id=job_id)
+    else:
+        background_tasks.add_task(
+            process_calendar_generation,
+            job_id=job_id,
+            request=request,
+            idempotency_key=idempotency_key
+        )
     
     return job
 
-async def process_calendar_generation(job_id: str, request: CalendarRequest):
+# In-flight generations keyed by the client's Idempotency-Key plus payload, so a
+# retried or double-submitted request shares one multi-agent run. Identical
+# payloads without a key (e.g. two users sending the sample request) run separately.
+_inflight_generations: Dict[str, asyncio.Task] = {}
+
+async def run_generation(request: CalendarRequest, personas: List[Persona]) -> GeneratedContent:
+    """Run the multi-agent generator"""
+    # The semaphore caps concurrent jobs so overlapping LLM calls stay within the Groq quota
+    async with generation_slots:
+        return await generate_reddit_calendar(
+            company_info=request.company_info,
+            personas=personas,
+            subreddits=request.subreddits,
+            target_queries=request.target_queries,
+            posts_per_week=request.posts_per_week,
+            week_number=request.week_number
+        )
+
+async def generate_coalesced(request: CalendarRequest, personas: List[Persona], idempotency_key: str) -> GeneratedContent:
+    """Join the in-flight generation for this idempotency key, or start a new one"""
+    key = f"{idempotency_key}:{request.model_dump_json()}"
+    task = _inflight_generations.get(key)
+    if task is None:
+        task = asyncio.ensure_future(run_generation(request, personas))
+        _inflight_generations[key] = task
+        task.add_done_callback(lambda _: _inflight_generations.pop(key, None))
+    # Shield so one cancelled waiter does not cancel the shared run
+    return await asyncio.shield(task)
+
+async def process_calendar_generation(job_id: str, request: CalendarRequest, idempotency_key: Optional[str] = None):
     """Background task for calendar generation"""
     
+    # Keep a local reference and write it back after every change, so both the
+    # in-memory and the Redis-backed stores see the latest state
+    job = await jobs_db.fetch(job_id)
+    if job is None:
+        logger.error("❌ Job %s not found", job_id)
+        return
+    
     try:
         # Update status
-        jobs_db[job_id].status = JobStatus.PROCESSING
+        job.status = JobStatus.PROCESSING
+        await jobs_db.save(job_id, job)
         
         # Convert API models to internal models
         personas = [
@@ -195,75 +494,99 @@ async def process_calendar_generation(job_id: str, request: CalendarRequest):
             for p in request.personas
         ]
         
-        # Generate calendar
-        content = generate_reddit_calendar(
-            company_info=request.company_info,
-            personas=personas,
-            subreddits=request.subreddits,
-            target_queries=request.target_queries,
-            posts_per_week=request.posts_per_week,
-            week_number=request.week_number
-        )
+        # Generate calendar (shared with a duplicate submission already running)
+        if idempotency_key:
+            content = await generate_coalesced(request, personas, idempotency_key)
+        else:
+            content = await run_generation(request, personas)
         
         # Create calendar ID
-        calendar_id = f"cal_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.urandom(4).hex()}"
+        calendar_id = f"cal_{uuid7()}"
         
-        # Create response
-        calendar_response = CalendarResponse(
+        # Create response (built from trusted data, so skip revalidation)
+        calendar_response = CalendarResponse.model_construct(
             calendar_id=calendar_id,
             week_number=request.week_number,
             generated_at=datetime.now().isoformat(),
-            posts=[p.model_dump() for p in content.posts],
-            comments=[c.model_dump() for c in content.comments],
+            posts=_POSTS_DUMP.dump_python(content.posts),
+            comments=_COMMENTS_DUMP.dump_python(content.comments),
             quality_assessment=content.quality_assessment.model_dump(),
             status="completed"
         )
         
         # Store calendar
-        calendars_db[calendar_id] = calendar_response
+        await calendars_db.save(calendar_id, StoredCalendar.encode(calendar_response, request))
         
         # Update job
-        jobs_db[job_id].status = JobStatus.COMPLETED
-        jobs_db[job_id].completed_at = datetime.now().isoformat()
-        jobs_db[job_id].result = calendar_response
+        job.status = JobStatus.COMPLETED
+        job.completed_at = datetime.now().isoformat()
+        job.result = calendar_response
+        await jobs_db.save(job_id, job)
         
     except Exception as e:
         # Handle errors
-        jobs_db[job_id].status = JobStatus.FAILED
-        jobs_db[job_id].completed_at = datetime.now().isoformat()
-        jobs_db[job_id].error = str(e)
-        print(f"❌ Job {job_id} failed: {e}")
+        job.status = JobStatus.FAILED
+        job.completed_at = datetime.now().isoformat()
+        job.error = str(e)
+        await jobs_db.save(job_id, job)
+        logger.error("❌ Job %s failed: %s", job_id, e)
+
+celery_app = None
+
+if CELERY_BROKER_URL:
+    from celery import Celery
+
+    celery_app = Celery("mastermind", broker=CELERY_BROKER_URL)
+
+    @celery_app.task(name="mastermind.generate_calendar")
+    def generate_calendar_task(job_id: str, payload: Dict):
+        """Celery entry point; runs the same generation pipeline in the worker"""
+        # Each task gets a fresh event loop, so drop clients pooled on the previous one
+        get_llm.cache_clear()
+        asyncio.run(run_generation_task(job_id, CalendarRequest.model_validate(payload)))
+
+    async def run_generation_task(job_id: str, request: CalendarRequest):
+        """Run one job, then close Redis connections opened on this task's event loop"""
+        try:
+            await process_calendar_generation(job_id, request)
+        finally:
+            await _redis.connection_pool.disconnect()
 
 @app.get("/api/calendar/status/{job_id}", response_model=JobResponse)
 async def get_job_status(job_id: str):
     """
     Check the status of a calendar generation job
     """
-    if job_id not in jobs_db:
+    job = await jobs_db.fetch(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    return jobs_db[job_id]
+    # Polled repeatedly while a job runs; encode directly instead of
+    # letting FastAPI re-validate the model against response_model
+    return json_response(_JOB_DUMP.dump_json(job))
 
 @app.get("/api/calendar/{calendar_id}", response_model=CalendarResponse)
-async def get_calendar(calendar_id: str):
+async def get_calendar(calendar_id: str, request: Request):
     """
     Retrieve a generated calendar by ID
     """
-    if calendar_id not in calendars_db:
+    stored = await calendars_db.fetch(calendar_id)
+    if stored is None:
         raise HTTPException(status_code=404, detail="Calendar not found")
     
-    return calendars_db[calendar_id]
+    # Calendars never change, so a matching ETag means the client copy is current
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or stored.etag in if_none_match):
+        return Response(status_code=304, headers={"etag": stored.etag})
+    
+    return json_response(stored.body, headers={"etag": stored.etag})
 
 @app.get("/api/calendars", response_model=List[CalendarResponse])
-async def list_calendars(limit: int = 10, offset: int = 0):
+async def list_calendars(limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0)):
     """
     List all generated calendars (paginated)
     """
-    calendars = list(calendars_db.values())
-    # Sort by generated_at descending
-    calendars.sort(key=lambda x: x.generated_at, reverse=True)
-    
-    return calendars[offset:offset + limit]
+    return json_response(await calendars_db.recent(offset, limit))
 
 @app.post("/api/calendar/generate-next-week/{calendar_id}", response_model=JobResponse, status_code=202)
 async def generate_next_week(
@@ -274,41 +597,49 @@ async def generate_next_week(
     Generate the next week's calendar based on an existing one
     (Simulates the cron job functionality)
     """
-    if calendar_id not in calendars_db:
+    stored = await calendars_db.fetch(calendar_id)
+    if stored is None:
         raise HTTPException(status_code=404, detail="Calendar not found")
     
-    # This would need the original request data - in production, store it
-    raise HTTPException(
-        status_code=501,
-        detail="Next week generation requires original request data. Store requests in DB for production use."
-    )
+    # Re-use the stored request; it was validated when the calendar was generated
+    request = _REQUEST_ADAPTER.validate_json(stored.request)
+    if request.week_number >= 52:
+        raise HTTPException(status_code=400, detail="Week 52 is the last week of the year")
+    
+    next_request = request.model_copy(update={"week_number": request.week_number + 1})
+    return await start_generation_job(next_request, background_tasks)
 
 @app.delete("/api/calendar/{calendar_id}")
 async def delete_calendar(calendar_id: str):
     """Delete a calendar"""
-    if calendar_id not in calendars_db:
+    if not await calendars_db.remove(calendar_id):
         raise HTTPException(status_code=404, detail="Calendar not found")
     
-    del calendars_db[calendar_id]
     return {"status": "deleted", "calendar_id": calendar_id}
 
 # ==================== VALIDATION ENDPOINTS ====================
 
-@app.post("/api/validate/personas")
-async def validate_personas(personas: List[PersonaCreate]):
+@app.post("/api/validate/personas", openapi_extra=_openapi_body(_PERSONAS_ADAPTER))
+async def validate_personas(http_request: Request):
     """
     Validate persona configurations without generating content
     """
+    personas = _validate_body(_PERSONAS_ADAPTER, await http_request.body())
     issues = []
     
+    # Collect usernames and expertise areas in a single pass
+    usernames = set()
+    expertise_areas = set()
+    for p in personas:
+        usernames.add(p.username)
+        expertise_areas.add(p.expertise.lower())
+    
     # Check for duplicate usernames
-    usernames = [p.username for p in personas]
-    if len(usernames) != len(set(usernames)):
+    if len(usernames) != len(personas):
         issues.append("Duplicate usernames detected")
     
     # Check diversity
-    expertise_areas = [p.expertise.lower() for p in personas]
-    if len(set(expertise_areas)) < len(personas) * 0.5:
+    if len(expertise_areas) < len(personas) * 0.5:
         issues.append("Personas lack diversity in expertise")
     
     return {
@@ -317,11 +648,12 @@ async def validate_personas(personas: List[PersonaCreate]):
         "persona_count": len(personas)
     }
 
-@app.post("/api/validate/request")
-async def validate_request(request: CalendarRequest):
+@app.post("/api/validate/request", openapi_extra=_openapi_body(_REQUEST_ADAPTER))
+async def validate_request(http_request: Request):
     """
     Validate entire request without generating content
     """
+    request = _validate_body(_REQUEST_ADAPTER, await http_request.body())
     issues = []
     warnings = []
     
@@ -381,10 +713,21 @@ async def get_sample_request():
 
 if __name__ == "__main__":
     import uvicorn
+    
+    # ENV=dev turns on the reloader and request logging; production runs quiet.
+    # loop/http "auto" pick uvloop and httptools when installed (uvicorn[standard]).
+    dev = os.getenv("ENV") == "dev"
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1 and not REDIS_URL:
+        raise SystemExit("WEB_CONCURRENCY > 1 requires REDIS_URL so workers share job storage")
+    
     uvicorn.run(
-        "main:app",
+        "app:app",
         host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+        port=int(os.getenv("PORT", "8000")),
+        workers=workers,
+        loop="auto",
+        http="auto",
+        reload=dev,
+        log_level="info" if dev else "warning"
+    )
@@ -2,21 +2,30 @@
 # Complete backend implementation with LangChain + Groq
 
 import os
+import asyncio
+import functools
+import logging
+import hashlib
 import random  # Moved out of loop
-from typing import List, Dict, Optional, Union
+from typing import Generic, List, Dict, Optional, Tuple, Type, TypedDict, TypeVar, Union
 from datetime import datetime, timedelta
 import json
 import re
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.runnables import RunnableConfig  # <-- Added for typing
+from langchain_core.caches import InMemoryCache
+from langchain_core.globals import set_llm_cache
+from langchain_core.output_parsers import BaseOutputParser, JsonOutputParser
+from langchain_core.utils.json import parse_json_markdown
+from langchain_core.runnables import Runnable, RunnableConfig  # <-- Added for typing
 from langgraph.graph import StateGraph, END
 import operator
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # ==================== DATA MODELS ====================
 
 class Persona(BaseModel):
@@ -83,33 +92,43 @@ class GeneratedContent(BaseModel):
     comments: List[RedditComment]
     quality_assessment: QualityScore
 
+# Serializers for prompt payloads (pydantic-core encodes the whole list in one call)
+_POSTS_JSON = TypeAdapter(List[RedditPost])
+_COMMENTS_JSON = TypeAdapter(List[RedditComment])
+_STRINGS_JSON = TypeAdapter(List[str])
+
 # ==================== STATE GRAPH ====================
 
-class RedditState(BaseModel):
-    """State for LangGraph workflow"""
+class RedditState(TypedDict, total=False):
+    """State for LangGraph workflow; nodes return only the keys they change"""
     # Inputs
     company_info: str
     personas: List[Persona]
     subreddits: List[str]
     target_queries: List[str]
     posts_per_week: int
-    week_number: int = 1
+    week_number: int
+    personas_by_username: Dict[str, Persona]
+    # Prompt blocks built once per run from the inputs above
+    personas_info: str
+    subreddits_text: str
+    keywords_text: str
     
     # Planning phase
-    strategic_plan: Optional[WeekPlan] = None
-    plan_critique: Optional[str] = None
+    strategic_plan: WeekPlan
+    plan_critique: str
     
     # Generation phase
-    generated_content: Optional[GeneratedContent] = None
-    content_critique: Optional[str] = None
+    generated_content: GeneratedContent
+    content_critique: str
     
     # Quality control
-    quality_score: Optional[QualityScore] = None
-    refinement_iteration: int = 0
-    max_iterations: int = 3
+    quality_score: QualityScore
+    refinement_iteration: int
+    max_iterations: int
     
     # Final output
-    final_content: Optional[GeneratedContent] = None
+    final_content: GeneratedContent
 
 # ==================== AGENT PROMPTS ====================
 
@@ -279,31 +298,16 @@ Body: "I run ops at a startup and somehow became the deck person. Every board me
 OUTPUT FORMAT (JSON):
 {{
   "title": "natural reddit title",
-  "body": "natural reddit body text (100-250 words)",
-  "reasoning": "why this sounds authentic"
+  "body": "natural reddit body text (100-250 words)"
 }}
 
-Now generate the post for {persona_name}:"""
-
-COMMENT_GENERATOR_PROMPT = """You are generating Reddit comments that sound 100% NATURAL and HUMAN.
+Output ONLY title and body. Do NOT include reasoning.
 
-ORIGINAL POST:
-Title: {post_title}
-Body: {post_body}
-Author: {post_author}
-
-YOU ARE: {commenter_name}
-Your Background: {commenter_background}
-Your Style: {commenter_style}
-
-PARENT COMMENT (if replying to another comment):
-{parent_comment}
-
-COMPANY CONTEXT:
-{company_info}
+Now generate the post for {persona_name}:"""
 
-COMMENT STRATEGY:
-{engagement_strategy}
+# The comment prompt is split so the stable part (rules, company, commenter) forms
+# a shared system prefix the provider can cache; only the user message varies per post
+COMMENT_SYSTEM_PROMPT = """You are generating Reddit comments that sound 100% NATURAL and HUMAN.
 
 CRITICAL RULES FOR NATURAL COMMENTS:
 
@@ -345,11 +349,29 @@ GOOD COMMENT (natural mention):
 OUTPUT FORMAT (JSON):
 {{
   "comment_text": "natural reddit comment",
-  "delay_minutes": 15-360 (realistic time between post and comment),
-  "engagement_type": "agreement|addition|story|question",
-  "reasoning": "why this sounds natural"
+  "engagement_type": "agreement|addition|story|question"
 }}
 
+Output ONLY comment_text and engagement_type. Do NOT include reasoning.
+
+COMPANY CONTEXT:
+{company_info}
+
+YOU ARE: {commenter_name}
+Your Background: {commenter_background}
+Your Style: {commenter_style}"""
+
+COMMENT_USER_PROMPT = """ORIGINAL POST:
+Title: {post_title}
+Body: {post_body}
+Author: {post_author}
+
+PARENT COMMENT (if replying to another comment):
+{parent_comment}
+
+COMMENT STRATEGY:
+{engagement_strategy}
+
 Generate the comment now:"""
 
 FINAL_CRITIC_PROMPT = """You are doing FINAL quality assurance on generated Reddit content.
@@ -408,150 +430,231 @@ Rate each dimension 0-10 and provide JSON:
 
 Be harsh. If something looks AI-generated, flag it:"""
 
+REFINE_PROMPT = """The strategic plan has issues. Refine it based on this feedback:
+
+ISSUES:
+{issues}
+
+SUGGESTIONS:
+{suggestions}
+
+ORIGINAL PLAN:
+{plan_json}
+
+Create an improved plan following the same JSON structure. Fix the issues while maintaining naturalness."""
+
+# Templates are parsed once at import and shared by every agent run
+_PLANNER_TEMPLATE = ChatPromptTemplate.from_template(PLANNER_PROMPT)
+_CRITIC_TEMPLATE = ChatPromptTemplate.from_template(CRITIC_PROMPT)
+_REFINE_TEMPLATE = ChatPromptTemplate.from_template(REFINE_PROMPT)
+_CONTENT_TEMPLATE = ChatPromptTemplate.from_template(CONTENT_GENERATOR_PROMPT)
+_COMMENT_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system", COMMENT_SYSTEM_PROMPT),
+    ("user", COMMENT_USER_PROMPT)
+])
+_FINAL_CRITIC_TEMPLATE = ChatPromptTemplate.from_template(FINAL_CRITIC_PROMPT)
+
 # ==================== LLM SETUP ====================
 
-def get_llm(temperature: float = 0.7) -> ChatGroq:
-    """Initialize Groq LLM"""
+# Exact-match LLM response cache: "off" (default), "memory" or "sqlite".
+# Only for development replays: a cached repeat request returns the same calendar
+# instead of a fresh sample, and refinement prompts never repeat exactly anyway.
+LLM_CACHE = os.getenv("LLM_CACHE", "off")
+_CACHE_INITIALIZED = False
+
+def _init_llm_cache() -> None:
+    """Install the process-wide LangChain LLM cache once"""
+    global _CACHE_INITIALIZED
+    if _CACHE_INITIALIZED:
+        return
+    _CACHE_INITIALIZED = True
+    
+    if LLM_CACHE == "sqlite":
+        from langchain_community.cache import SQLiteCache  # optional dependency
+        set_llm_cache(SQLiteCache(database_path=os.getenv("LLM_CACHE_PATH", ".groq_cache.db")))
+    elif LLM_CACHE == "memory":
+        set_llm_cache(InMemoryCache(maxsize=int(os.getenv("LLM_CACHE_SIZE", "1024"))))
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"  # or mixtral-8x7b-32768
+# Critics only emit a small score JSON, so a smaller, faster model with a capped budget is enough
+CRITIC_MODEL = "llama-3.1-8b-instant"
+CRITIC_MAX_TOKENS = 512
+
+@functools.lru_cache(maxsize=8)
+def get_llm(temperature: float = 0.7, max_tokens: Optional[int] = None, model: Optional[str] = None) -> ChatGroq:
+    """Get the shared Groq LLM for these settings, keeping its connection pool alive"""
+    _init_llm_cache()
     return ChatGroq(
         temperature=temperature,
-        model_name="llama-3.3-70b-versatile",  # or mixtral-8x7b-32768
+        model_name=model or DEFAULT_MODEL,
+        max_tokens=max_tokens,
         groq_api_key=os.getenv("GROQ_API_KEY")
     )
 
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+class PydanticJsonParser(BaseOutputParser[ModelT], Generic[ModelT]):
+    """Parse and validate LLM JSON output into a model in one pass"""
+    model_cls: Type[ModelT]
+    
+    def parse(self, text: str) -> ModelT:
+        # Strip a ```json fence so the common case stays on the jiter fast path
+        match = re.search(r"```(?:json)?\s*(.*?)\s*```", text, re.DOTALL)
+        raw = match.group(1) if match else text.strip()
+        try:
+            return self.model_cls.model_validate_json(raw)
+        except ValidationError as e:
+            if e.errors()[0]["type"] != "json_invalid":
+                raise
+        # Prose around the JSON or partial output: fall back to the lenient parser
+        return self.model_cls.model_validate(parse_json_markdown(text))
+
+# Upper bound on simultaneous Groq requests from this process, across all runs.
+# Set GROQ_MAX_CONCURRENCY to the account tier's concurrent request limit.
+MAX_CONCURRENT_LLM_CALLS = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
+_llm_slots: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = None
+
+def llm_slots() -> asyncio.Semaphore:
+    """Process-wide LLM call semaphore; recreated when a new event loop takes over (Celery tasks)"""
+    global _llm_slots
+    loop = asyncio.get_running_loop()
+    if _llm_slots is None or _llm_slots[0] is not loop:
+        _llm_slots = (loop, asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS))
+    return _llm_slots[1]
+
+async def limited_invoke(chain: Runnable, kwargs: Dict):
+    """Invoke a chain while holding one of the process-wide LLM call slots"""
+    async with llm_slots():
+        return await chain.ainvoke(kwargs)
+
+# Identical prompts in flight at once share one Groq call
+_inflight_calls: Dict[bytes, asyncio.Future] = {}
+
+async def coalesced_invoke(name: str, chain: Runnable, kwargs: Dict) -> Dict:
+    """Invoke a named chain, awaiting an identical in-flight call instead of repeating it"""
+    key = hashlib.blake2b(
+        f"{name}:{json.dumps(kwargs, sort_keys=True)}".encode(), digest_size=16
+    ).digest()
+    if key in _inflight_calls:
+        return await asyncio.shield(_inflight_calls[key])
+    
+    future = asyncio.ensure_future(limited_invoke(chain, kwargs))
+    _inflight_calls[key] = future
+    future.add_done_callback(lambda _: _inflight_calls.pop(key, None))
+    return await asyncio.shield(future)
+
 # ==================== AGENT FUNCTIONS ====================
 
-def planner_agent(state: Dict, config: RunnableConfig | None = None) -> Dict:
+async def planner_agent(state: Dict, config: RunnableConfig | None = None) -> Dict:
     """Strategic planning agent"""
-    print("\n🎯 PLANNER AGENT: Creating strategic content plan...")
-    print(f"DEBUG: Incoming state keys: {list(state.keys())}")  # Debug
-    print(f"DEBUG: company_info present? {'company_info' in state}")
+    logger.info("🎯 PLANNER AGENT: Creating strategic content plan...")
+    logger.debug("Incoming state keys: %s", list(state.keys()))
     
     llm = get_llm(temperature=0.8)
     
-    # Format personas for prompt
-    personas_info = "\n\n".join([
-        f"Username: {p.username}\n"
-        f"Name: {p.name}\n"
-        f"Background: {p.background}\n"
-        f"Style: {p.style}\n"
-        f"Expertise: {p.expertise}"
-        for p in state['personas']
-    ])
-    
-    prompt = ChatPromptTemplate.from_template(PLANNER_PROMPT)
-    chain = prompt | llm | JsonOutputParser()
+    chain = _PLANNER_TEMPLATE | llm | PydanticJsonParser(model_cls=WeekPlan)
     
     try:
-        result = chain.invoke({
+        week_plan = await limited_invoke(chain, {
             "company_info": state['company_info'],
-            "personas_info": personas_info,
-            "subreddits": "\n".join(state['subreddits']),
-            "keywords": "\n".join(state['target_queries']),
+            "personas_info": state['personas_info'],
+            "subreddits": state['subreddits_text'],
+            "keywords": state['keywords_text'],
             "posts_per_week": state['posts_per_week'],
             "week_number": state['week_number']
         })
         
-        week_plan = WeekPlan(**result)
-        print(f"✅ Generated plan with {len(week_plan.posts)} posts")
+        logger.info("✅ Generated plan with %d posts", len(week_plan.posts))
         
-        return {**state, "strategic_plan": week_plan}  # <-- Spread state to preserve!
+        return {"strategic_plan": week_plan}
         
     except Exception as e:
-        print(f"❌ Planner failed: {e}")
-        return {**state}  # Preserve on error
-        raise
+        logger.error("❌ Planner failed: %s", e)
+        return {}  # Leave state unchanged on error
 
-def plan_critic_agent(state: Dict, config: RunnableConfig | None = None) -> Dict:
+async def plan_critic_agent(state: Dict, config: RunnableConfig | None = None) -> Dict:
     """Critique the strategic plan"""
-    print("\n🔍 CRITIC AGENT: Reviewing strategic plan...")
-    print(f"DEBUG: Incoming state keys: {list(state.keys())}")  # <-- Added debug
-    print(f"DEBUG: company_info value: {state.get('company_info', 'MISSING')}")
+    logger.info("🔍 CRITIC AGENT: Reviewing strategic plan...")
+    logger.debug("Incoming state keys: %s", list(state.keys()))
     
-    llm = get_llm(temperature=0.3)
+    llm = get_llm(temperature=0.3, max_tokens=CRITIC_MAX_TOKENS, model=CRITIC_MODEL)
     
     plan_json = state['strategic_plan'].model_dump_json(indent=2)
     
-    prompt = ChatPromptTemplate.from_template(CRITIC_PROMPT)
-    chain = prompt | llm | JsonOutputParser()
+    chain = _CRITIC_TEMPLATE | llm | PydanticJsonParser(model_cls=QualityScore)
     
     try:
-        result = chain.invoke({
+        quality = await limited_invoke(chain, {
             "plan_json": plan_json,
             "company_info": state['company_info']
         })
         
-        quality = QualityScore(**result)
-        print(f"📊 Quality Score: {quality.overall_score}/10")
+        logger.info("📊 Quality Score: %s/10", quality.overall_score)
         
         if quality.issues:
-            print(f"⚠️  Issues found: {len(quality.issues)}")
+            logger.info("⚠️  Issues found: %d", len(quality.issues))
             for issue in quality.issues:
-                print(f"   - {issue}")
+                logger.info("   - %s", issue)
         
-        return {  # <-- Spread state
-            **state,
+        return {
             "quality_score": quality,
-            "plan_critique": json.dumps(result)
+            "plan_critique": quality.model_dump_json()
         }
         
     except Exception as e:
-        print(f"❌ Critic failed: {e}")
-        return {**state}  # Preserve on error
-        raise
+        logger.error("❌ Critic failed: %s", e)
+        return {}  # Leave state unchanged on error
 
 def should_refine_plan(state: Dict, config: RunnableConfig | None = None) -> str:
     """Decide if plan needs refinement"""
-    print(f"DEBUG: Conditional - keys: {list(state.keys())}")  # Debug
+    logger.debug("Conditional - keys: %s", list(state.keys()))
     if state['quality_score'].overall_score >= 7.5:
         return "generate_content"
     elif state['refinement_iteration'] >= state['max_iterations']:
-        print("⚠️  Max iterations reached, proceeding anyway")
+        logger.warning("⚠️  Max iterations reached, proceeding anyway")
         return "generate_content"
     else:
-        print(f"🔄 Refinement needed (iteration {state['refinement_iteration'] + 1})")
+        logger.info("🔄 Refinement needed (iteration %d)", state['refinement_iteration'] + 1)
         return "refine_plan"
 
-def refine_plan_agent(state: Dict, config: RunnableConfig | None = None) -> Dict:
+def should_run_final_critic(state: Dict, config: RunnableConfig | None = None) -> str:
+    """Skip the final critic when the plan passed first time with a high score"""
+    if state['refinement_iteration'] == 0 and state['quality_score'].overall_score >= 9:
+        logger.info("⏭️  Plan scored %s/10 first time, skipping final critic", state['quality_score'].overall_score)
+        return "skip"
+    return "final_critic"
+
+async def refine_plan_agent(state: Dict, config: RunnableConfig | None = None) -> Dict:
     """Refine plan based on critique"""
-    print("\n🔧 REFINE AGENT: Improving plan based on feedback...")
-    print(f"DEBUG: Incoming state keys: {list(state.keys())}")  # Debug
+    logger.info("🔧 REFINE AGENT: Improving plan based on feedback...")
+    logger.debug("Incoming state keys: %s", list(state.keys()))
     
     llm = get_llm(temperature=0.8)
     
-    refine_prompt = f"""The strategic plan has issues. Refine it based on this feedback:
-
-ISSUES:
-{json.dumps(state['quality_score'].issues, indent=2)}
-
-SUGGESTIONS:
-{json.dumps(state['quality_score'].suggestions, indent=2)}
-
-ORIGINAL PLAN:
-{state['strategic_plan'].model_dump_json(indent=2)}
-
-Create an improved plan following the same JSON structure. Fix the issues while maintaining naturalness."""
-    
-    prompt = ChatPromptTemplate.from_template(refine_prompt)
-    chain = prompt | llm | JsonOutputParser()
+    # The plan JSON is passed as a variable; formatting it into the template
+    # text would make its braces parse as placeholders
+    chain = _REFINE_TEMPLATE | llm | PydanticJsonParser(model_cls=WeekPlan)
     
     try:
-        result = chain.invoke({})
-        week_plan = WeekPlan(**result)
+        week_plan = await limited_invoke(chain, {
+            "issues": _STRINGS_JSON.dump_json(state['quality_score'].issues, indent=2).decode(),
+            "suggestions": _STRINGS_JSON.dump_json(state['quality_score'].suggestions, indent=2).decode(),
+            "plan_json": state['strategic_plan'].model_dump_json(indent=2)
+        })
         
-        return {  # <-- Spread state
-            **state,
+        return {
             "strategic_plan": week_plan,
             "refinement_iteration": state['refinement_iteration'] + 1
         }
         
     except Exception as e:
-        print(f"❌ Refinement failed: {e}")
-        return {**state, "refinement_iteration": state['refinement_iteration'] + 1}
+        logger.error("❌ Refinement failed: %s", e)
+        return {"refinement_iteration": state['refinement_iteration'] + 1}
 
-def content_generator_agent(state: Dict, config: RunnableConfig | None = None) -> Dict:
+async def content_generator_agent(state: Dict, config: RunnableConfig | None = None) -> Dict:
     """Generate actual posts and comments"""
-    print("\n✍️  CONTENT GENERATOR: Creating posts and comments...")
-    print(f"DEBUG: Incoming state keys: {list(state.keys())}")  # Debug
+    logger.info("✍️  CONTENT GENERATOR: Creating posts and comments...")
+    logger.debug("Incoming state keys: %s", list(state.keys()))
     
     llm = get_llm(temperature=0.9)  # Higher temp for creativity
     
@@ -559,19 +662,29 @@ def content_generator_agent(state: Dict, config: RunnableConfig | None = None) -
     comments = []
     
     plan = state['strategic_plan']
-    personas_dict = {p.username: p for p in state['personas']}
+    personas_dict = state['personas_by_username']  # indexed once per run
     
+    post_chain = _CONTENT_TEMPLATE | llm | JsonOutputParser()
+    comment_chain = _COMMENT_TEMPLATE | llm | JsonOutputParser()
+    
+    # Queue every known post; each worker takes a post and runs its comment
+    # thread as soon as the post lands instead of waiting for all posts
+    post_queue: asyncio.Queue = asyncio.Queue()
     for i, post_plan in enumerate(plan.posts):
-        print(f"\n  Generating post {i+1}/{len(plan.posts)} in {post_plan.subreddit}...")
-        
-        # Generate post
+        if post_plan.primary_persona not in personas_dict:
+            logger.error("    ❌ Post generation failed: unknown persona %s", post_plan.primary_persona)
+            continue
+        post_queue.put_nowait((i, post_plan))
+    
+    # Per-post results, kept by plan index so numbering stays in plan order.
+    # Each thread holds (commenter, comment text, delay, parent index within the thread).
+    planned_posts: Dict[int, tuple] = {}
+    threads: Dict[int, list] = {}
+    
+    async def generate_post_thread(i: int, post_plan: PostPlan) -> None:
         primary_persona = personas_dict[post_plan.primary_persona]
-        
-        post_prompt = ChatPromptTemplate.from_template(CONTENT_GENERATOR_PROMPT)
-        post_chain = post_prompt | llm | JsonOutputParser()
-        
         try:
-            post_result = post_chain.invoke({
+            post_result = await coalesced_invoke("post", post_chain, {
                 "persona_name": primary_persona.username,
                 "persona_background": primary_persona.background,
                 "persona_style": primary_persona.style,
@@ -589,73 +702,85 @@ def content_generator_agent(state: Dict, config: RunnableConfig | None = None) -
                 "%Y-%m-%d %H:%M"
             )
             
-            post = RedditPost(
+            # Fields are already typed here; only the LLM strings need coercing
+            post = RedditPost.model_construct(
                 post_id=f"P{i+1}",
                 subreddit=post_plan.subreddit,
-                title=post_result['title'],
-                body=post_result['body'],
-                author_username=primary_persona.username,
+                title=str(post_result['title']),
+                body=str(post_result['body']),
+                author_username=post_plan.primary_persona,
                 timestamp=post_time.strftime("%Y-%m-%d %H:%M"),
                 keyword_ids=[post_plan.target_keyword]
             )
-            posts.append(post)
-            print(f"    ✅ Post created: {post.title[:50]}...")
-            
-            # Generate comments
-            for j, commenter_username in enumerate(post_plan.commenting_personas):
-                commenter = personas_dict[commenter_username]
-                
-                # Determine parent comment
-                parent_comment_text = None
-                parent_comment_id = None
-                
-                if j > 0 and len(comments) > 0:
-                    # Sometimes reply to previous comment (threading)
-                    if len([c for c in comments if c.post_id == post.post_id]) > 0:
-                        if random.random() > 0.5:  # 50% chance to thread
-                            previous_comments = [c for c in comments if c.post_id == post.post_id]
-                            parent = previous_comments[-1]
-                            parent_comment_text = parent.comment_text
-                            parent_comment_id = parent.comment_id
-                
-                comment_prompt = ChatPromptTemplate.from_template(COMMENT_GENERATOR_PROMPT)
-                comment_chain = comment_prompt | llm | JsonOutputParser()
-                
-                try:
-                    comment_result = comment_chain.invoke({
-                        "post_title": post.title,
-                        "post_body": post.body,
-                        "post_author": post.author_username,
-                        "commenter_name": commenter.username,
-                        "commenter_background": commenter.background,
-                        "commenter_style": commenter.style,
-                        "parent_comment": parent_comment_text or "None (top-level comment)",
-                        "company_info": state['company_info'],
-                        "engagement_strategy": post_plan.engagement_strategy
-                    })
-                    
-                    # Calculate comment timestamp
-                    comment_time = post_time + timedelta(minutes=comment_result.get('delay_minutes', 30))
-                    
-                    comment = RedditComment(
-                        comment_id=f"C{len(comments)+1}",
-                        post_id=post.post_id,
-                        parent_comment_id=parent_comment_id,
-                        comment_text=comment_result['comment_text'],
-                        username=commenter.username,
-                        timestamp=comment_time.strftime("%Y-%m-%d %H:%M"),
-                        delay_minutes=comment_result.get('delay_minutes', 30)
-                    )
-                    comments.append(comment)
-                    print(f"    ✅ Comment {j+1} by {commenter.username}")
-                    
-                except Exception as e:
-                    print(f"    ⚠️  Comment generation failed: {e}")
-                    continue
+            logger.info("    ✅ Post created: %.50s...", post.title)
             
         except Exception as e:
-            print(f"    ❌ Post generation failed: {e}")
-            continue
+            logger.error("    ❌ Post generation failed: %s", e)
+            return
+        
+        planned_posts[i] = (post, post_time)
+        thread = threads[i] = []
+        # Sometimes reply to previous comment (threading), decided up front per commenter
+        thread_flags = [random.random() > 0.5 for _ in post_plan.commenting_personas]  # 50% chance to thread
+        # Minutes after the post; log-normal (median ~55) follows real comment arrival, clamped to 15-360.
+        # Sorted so later commenters, and replies, never land before the comments above them.
+        delays = sorted(max(15, min(360, int(random.lognormvariate(4.0, 1.0)))) for _ in post_plan.commenting_personas)
+        
+        for j, commenter_username in enumerate(post_plan.commenting_personas):
+            commenter = personas_dict.get(commenter_username)
+            if commenter is None:
+                logger.warning("    ⚠️  Comment generation failed: unknown persona %s", commenter_username)
+                continue
+            
+            # Determine parent comment: the latest comment in this post's thread
+            parent_index = len(thread) - 1 if thread_flags[j] and thread else None
+            
+            try:
+                comment_result = await coalesced_invoke("comment", comment_chain, {
+                    "post_title": post.title,
+                    "post_body": post.body,
+                    "post_author": post.author_username,
+                    "commenter_name": commenter.username,
+                    "commenter_background": commenter.background,
+                    "commenter_style": commenter.style,
+                    "parent_comment": thread[parent_index][1] if parent_index is not None else "None (top-level comment)",
+                    "company_info": state['company_info'],
+                    "engagement_strategy": post_plan.engagement_strategy
+                })
+                comment_text = str(comment_result['comment_text'])
+            except Exception as e:
+                logger.warning("    ⚠️  Comment generation failed: %s", e)
+                continue
+            thread.append((commenter, comment_text, delays[j], parent_index))
+            logger.info("    ✅ Comment %d on %s by %s", j + 1, post.post_id, commenter.username)
+    
+    async def worker() -> None:
+        while not post_queue.empty():
+            await generate_post_thread(*post_queue.get_nowait())
+    
+    # Workers keep at most one call per post in flight; llm_slots() enforces the process-wide limit
+    logger.info("  Generating %d posts...", post_queue.qsize())
+    await asyncio.gather(*(worker() for _ in range(min(MAX_CONCURRENT_LLM_CALLS, post_queue.qsize()))))
+    
+    # Number posts and comments in plan order and resolve thread-local parents to ids
+    for i in sorted(planned_posts):
+        post, post_time = planned_posts[i]
+        posts.append(post)
+        first = len(comments)
+        for commenter, comment_text, delay_minutes, parent_index in threads[i]:
+            # Calculate comment timestamp
+            comment_time = post_time + timedelta(minutes=delay_minutes)
+            
+            comment = RedditComment.model_construct(
+                comment_id=f"C{len(comments)+1}",
+                post_id=post.post_id,
+                parent_comment_id=f"C{first + parent_index + 1}" if parent_index is not None else None,
+                comment_text=comment_text,
+                username=commenter.username,
+                timestamp=comment_time.strftime("%Y-%m-%d %H:%M"),
+                delay_minutes=delay_minutes
+            )
+            comments.append(comment)
     
     generated_content = GeneratedContent(
         posts=posts,
@@ -669,58 +794,55 @@ def content_generator_agent(state: Dict, config: RunnableConfig | None = None) -
         )
     )
     
-    return {**state, "generated_content": generated_content}  # <-- Spread state
+    return {"generated_content": generated_content}
 
-def final_critic_agent(state: Dict, config: RunnableConfig | None = None) -> Dict:
+async def final_critic_agent(state: Dict, config: RunnableConfig | None = None) -> Dict:
     """Final quality check on generated content"""
-    print("\n🔍 FINAL CRITIC: Assessing generated content...")
-    print(f"DEBUG: Incoming state keys: {list(state.keys())}")  # Debug
+    logger.info("🔍 FINAL CRITIC: Assessing generated content...")
+    logger.debug("Incoming state keys: %s", list(state.keys()))
     
-    llm = get_llm(temperature=0.2)
+    llm = get_llm(temperature=0.2, max_tokens=CRITIC_MAX_TOKENS, model=CRITIC_MODEL)
     
     content = state['generated_content']
-    posts_json = json.dumps([p.model_dump() for p in content.posts], indent=2)
-    comments_json = json.dumps([c.model_dump() for c in content.comments], indent=2)
+    posts_json = _POSTS_JSON.dump_json(content.posts, indent=2).decode()
+    comments_json = _COMMENTS_JSON.dump_json(content.comments, indent=2).decode()
     
-    prompt = ChatPromptTemplate.from_template(FINAL_CRITIC_PROMPT)
-    chain = prompt | llm | JsonOutputParser()
+    chain = _FINAL_CRITIC_TEMPLATE | llm | PydanticJsonParser(model_cls=QualityScore)
     
     try:
-        result = chain.invoke({
+        quality = await limited_invoke(chain, {
             "posts_json": posts_json,
             "comments_json": comments_json
         })
         
-        quality = QualityScore(**result)
-        print(f"\n📊 FINAL QUALITY SCORE: {quality.overall_score}/10")
-        print(f"   Naturalness: {quality.naturalness}/10")
-        print(f"   Authenticity: {quality.authenticity}/10")
-        print(f"   Engagement: {quality.engagement_potential}/10")
-        print(f"   Subtlety: {quality.subtlety}/10")
+        logger.info("📊 FINAL QUALITY SCORE: %s/10", quality.overall_score)
+        logger.info("   Naturalness: %s/10", quality.naturalness)
+        logger.info("   Authenticity: %s/10", quality.authenticity)
+        logger.info("   Engagement: %s/10", quality.engagement_potential)
+        logger.info("   Subtlety: %s/10", quality.subtlety)
         
         if quality.issues:
-            print(f"\n⚠️  Issues found:")
+            logger.info("⚠️  Issues found:")
             for issue in quality.issues:
-                print(f"   - {issue}")
+                logger.info("   - %s", issue)
         
         content.quality_assessment = quality
         
-        return {  # <-- Spread state
-            **state,
+        return {
             "final_content": content,
-            "content_critique": json.dumps(result)
+            "content_critique": quality.model_dump_json()
         }
         
     except Exception as e:
-        print(f"❌ Final critic failed: {e}")
-        return {**state, "final_content": state['generated_content']}
+        logger.error("❌ Final critic failed: %s", e)
+        return {"final_content": state['generated_content']}
 
 # ==================== WORKFLOW GRAPH ====================
 
 def build_workflow() -> StateGraph:
     """Build the LangGraph workflow"""
     
-    workflow = StateGraph(dict)
+    workflow = StateGraph(RedditState)
     
     # Add nodes
     workflow.add_node("planner", planner_agent)
@@ -741,14 +863,21 @@ def build_workflow() -> StateGraph:
         }
     )
     workflow.add_edge("refine_plan", "plan_critic")
-    workflow.add_edge("generate_content", "final_critic")
+    workflow.add_conditional_edges(
+        "generate_content",
+        should_run_final_critic,
+        {
+            "final_critic": "final_critic",
+            "skip": END
+        }
+    )
     workflow.add_edge("final_critic", END)
     
     return workflow.compile()
 
 # ==================== MAIN EXECUTION ====================
 
-def generate_reddit_calendar(
+async def generate_reddit_calendar(
     company_info: str,
     personas: List[Persona],
     subreddits: List[str],
@@ -758,16 +887,26 @@ def generate_reddit_calendar(
 ) -> GeneratedContent:
     """Main function to generate Reddit content calendar"""
     
-    print("="*60)
-    print("🚀 REDDIT MASTERMIND - Multi-Agent System")
-    print("="*60)
+    logger.info("🚀 REDDIT MASTERMIND - Multi-Agent System")
     
     # Initialize state
     initial_state = {
         "company_info": company_info,
         "personas": personas,
+        "personas_by_username": {p.username: p for p in personas},
         "subreddits": subreddits,
         "target_queries": target_queries,
+        # Format personas and targets for the planner once; refinement loops reuse them
+        "personas_info": "\n\n".join([
+            f"Username: {p.username}\n"
+            f"Name: {p.name}\n"
+            f"Background: {p.background}\n"
+            f"Style: {p.style}\n"
+            f"Expertise: {p.expertise}"
+            for p in personas
+        ]),
+        "subreddits_text": "\n".join(subreddits),
+        "keywords_text": "\n".join(target_queries),
         "posts_per_week": posts_per_week,
         "week_number": week_number,
         "refinement_iteration": 0,
@@ -778,21 +917,27 @@ def generate_reddit_calendar(
     app = build_workflow()
     
     try:
-        final_state = app.invoke(initial_state)
+        final_state = await app.ainvoke(initial_state)
+        
+        logger.info("✅ GENERATION COMPLETE!")
         
-        print("\n" + "="*60)
-        print("✅ GENERATION COMPLETE!")
-        print("="*60)
+        if 'final_content' in final_state:
+            return final_state['final_content']
         
-        return final_state['final_content']
+        # Final critic was skipped: carry the plan's assessment over to the content
+        content = final_state['generated_content']
+        content.quality_assessment = final_state['quality_score'].model_copy()
+        return content
         
     except Exception as e:
-        print(f"\n❌ Workflow failed: {e}")
+        logger.error("❌ Workflow failed: %s", e)
         raise
 
 # ==================== EXAMPLE USAGE ====================
 
 if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(message)s")
+    
     # Parse personas from the document
     personas = [
         Persona(
@@ -841,14 +986,14 @@ if __name__ == "__main__":
     ]
     
     # Generate content
-    content = generate_reddit_calendar(
+    content = asyncio.run(generate_reddit_calendar(
         company_info=company_info,
         personas=personas,
         subreddits=subreddits,
         target_queries=target_queries,
         posts_per_week=3,
         week_number=1
-    )
+    ))
     
     # Export to JSON
     output = {
@@ -860,6 +1005,6 @@ if __name__ == "__main__":
     with open("reddit_calendar_week1.json", "w") as f:
         json.dump(output, f, indent=2)
     
-    print(f"\n📁 Saved to reddit_calendar_week1.json")
-    print(f"📊 Generated {len(content.posts)} posts with {len(content.comments)} comments")
-    print(f"⭐ Quality Score: {content.quality_assessment.overall_score}/10")
\ No newline at end of file
+    logger.info("📁 Saved to reddit_calendar_week1.json")
+    logger.info("📊 Generated %d posts with %d comments", len(content.posts), len(content.comments))
+    logger.info("⭐ Quality Score: %s/10", content.quality_assessment.overall_score)
\ No newline at end of file